@@ -0,0 +1,60 @@
+"""
+Batch job that precomputes restaurant summaries into the summary index.
+
+Every restaurant in INDEX_NAME is visited with a composite aggregation. A summary is only
+regenerated when there is none yet or when the restaurant's review count differs from the count
+it was generated from, so re-running the job after new reviews are indexed only refreshes those.
+
+Usage:
+    python build_summaries.py
+"""
+from rag import ES, INDEX_NAME, SUMMARY_INDEX, get_stored_summaries, refresh_summaries
+
+
+BATCH_SIZE = 20  # restaurants per msearch / Gemini batch
+
+
+def iter_review_counts():
+    """Yield dicts of restaurant name to review count, BATCH_SIZE restaurants at a time."""
+    after_key = None
+    while True:
+        composite = {
+            "size": BATCH_SIZE,
+            "sources": [{"restaurant_name": {"terms": {"field": "metadata.restaurant_name.keyword"}}}],
+        }
+        if after_key:
+            composite["after"] = after_key
+        result = ES.search(index=INDEX_NAME, body={"size": 0, "aggs": {"restaurants": {"composite": composite}}})
+
+        aggregation = result["aggregations"]["restaurants"]
+        if not aggregation["buckets"]:
+            return
+        yield {bucket["key"]["restaurant_name"]: bucket["doc_count"] for bucket in aggregation["buckets"]}
+
+        after_key = aggregation.get("after_key")
+        if after_key is None:
+            return
+
+
+def build_summaries():
+    refreshed = 0
+    failed = []
+    for review_counts in iter_review_counts():
+        stored = get_stored_summaries(list(review_counts))
+        stale = [
+            name for name, count in review_counts.items()
+            if stored.get(name, {}).get("review_count_at_gen") != count
+        ]
+        if stale:
+            _, written = refresh_summaries(stale)
+            refreshed += len(written)
+            failed.extend(name for name in stale if name not in written)
+            print(f"Refreshed {refreshed} summaries, {len(failed)} failed")
+
+    print(f"Done: {refreshed} summaries refreshed in {SUMMARY_INDEX}")
+    if failed:
+        print(f"Failed to generate or store {len(failed)} summaries: {', '.join(failed)}")
+
+
+if __name__ == '__main__':
+    build_summaries()
@@ -0,0 +1,34 @@
+"""
+Export the MiniLM embedding model to ONNX with INT8 dynamic quantization.
+
+The quantized model, its config and tokenizer are written to ONNX_MODEL_DIR, where rag.py picks
+them up instead of the PyTorch model. ONNX Runtime applies its graph optimizations when the
+session is created and uses all physical cores for intra-op parallelism by default.
+
+Usage:
+    python export_onnx.py
+"""
+import tempfile
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+from rag import EMBED_MODEL, ONNX_MODEL_DIR
+
+
+def export_onnx(output_dir=ONNX_MODEL_DIR):
+    model = ORTModelForFeatureExtraction.from_pretrained(EMBED_MODEL, export=True)
+    with tempfile.TemporaryDirectory() as export_dir:
+        model.save_pretrained(export_dir)
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        # Dynamic quantization needs no calibration data; avx2 kernels run on any modern x86 CPU
+        quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        # An empty suffix keeps the file name model.onnx so from_pretrained finds it
+        quantizer.quantize(save_dir=output_dir, quantization_config=quantization_config, file_suffix="")
+
+    model.config.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(EMBED_MODEL).save_pretrained(output_dir)
+    print(f"Saved quantized ONNX model to {output_dir}")
+
+
+if __name__ == '__main__':
+    export_onnx()
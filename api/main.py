@@ -1,9 +1,11 @@
 from fastapi import FastAPI
-from rag import get_suggestions, get_summary, restaurant_qna
+from fastapi.responses import StreamingResponse
+from rag import get_suggestions, get_summary, get_summaries, restaurant_qna, stream_suggestions
 import uvicorn
 from pydantic import BaseModel
 from typing import Optional
 
+import asyncio
 import json
 
 
@@ -17,6 +19,9 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     response: str
 
+class SummariesRequest(BaseModel):
+    restaurant_names: list[str]
+
 
 @app.get('/')
 def home():
@@ -25,24 +30,36 @@ def home():
 
 @app.get('/suggest')
 async def suggest_restaurant(query: str):
-    result = get_suggestions(query)
+    result = await asyncio.to_thread(get_suggestions, query)
     return json.loads(result)
 
 
+@app.get('/suggest/stream')
+async def suggest_restaurant_stream(query: str):
+    # A sync generator is iterated in the threadpool, so it doesn't block the event loop
+    return StreamingResponse(stream_suggestions(query), media_type='application/x-ndjson')
+
+
 @app.get('/summary/{restaurant_name}')
 async def summarize(restaurant_name: str):
-    result = get_summary(restaurant_name)
+    result = await asyncio.to_thread(get_summary, restaurant_name)
+    return json.loads(result)
+
+
+@app.post('/summaries')
+async def summarize_many(request: SummariesRequest):
+    result = await asyncio.to_thread(get_summaries, request.restaurant_names)
     return json.loads(result)
 
 
 @app.post('/query')
 async def query_index(request: QueryRequest):
-    result = restaurant_qna(request.restaurant_name, request.query)
+    result = await asyncio.to_thread(restaurant_qna, request.restaurant_name, request.query)
     return json.loads(result)
 
 
 if __name__ == '__main__':
-    uvicorn.run('main:app', host='127.0.0.1', port=8000, reload=True)
+    uvicorn.run('main:app', host='127.0.0.1', port=8000, loop='uvloop', http='httptools', reload=True)
 
 
 
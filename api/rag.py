@@ -2,10 +2,21 @@ from elasticsearch import Elasticsearch, exceptions
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 import os
+import ahocorasick
+import numpy as np
 import spacy
 import json
+import orjson
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
+from pydantic import BaseModel
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from llama_index.embeddings.huggingface_optimum import OptimumEmbedding
 
 
 # ---------------------- Config ---------------------- #
@@ -13,13 +24,30 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("googleAIStudio")
 ES_HOST = os.getenv("ES_HOST", "http://localhost:9200")
 INDEX_NAME = os.getenv("ES_INDEX", "restaurant_reviews")
+SUMMARY_INDEX = os.getenv("ES_SUMMARY_INDEX", "restaurant_summaries")
 GEN_MODEL = "gemini-1.5-flash"
-EMBED_MODEL = HuggingFaceEmbedding(model_name="sentence-transformers/all-MiniLM-L6-v2")
+NER_MODEL = "en_core_web_sm"
+GAZETTEER_SIZE = 10000  # max distinct location values loaded from the index
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "minilm-onnx")  # written by export_onnx.py
 
 # KNN config
-K = 50
+K = 50  # nearest reviews; several can belong to the same restaurant
+MAX_RESTAURANTS = 10  # at most this many unique restaurants are kept after collapsing the K reviews
 NUM_CANDIDATES = 200 # larger candidate pool improves recall
 
+# Review config
+REVIEW_FRAGMENT_SIZE = 200  # characters per highlighted review fragment
+REVIEW_FRAGMENTS = 2  # fragments kept per review
+
+# Micro-batching config
+BATCH_WAIT = 0.005  # seconds to wait for more requests before running a batch
+NER_BATCH_SIZE = 32
+EMBED_BATCH_SIZE = 16
+
+# Gemini config
+GEMINI_WORKERS = 4  # max concurrent Gemini calls when summarizing several restaurants
+
 # ----------------- Clients ----------------- #
 try:
     ES = Elasticsearch(ES_HOST)
@@ -27,91 +55,294 @@ except exceptions as e:
     print(f"Elasticsearch error: {e}")
 
 genai.configure(api_key=GOOGLE_API_KEY)
+GEMINI = genai.GenerativeModel(GEN_MODEL)
+
+
+# ----------------- Response schemas ----------------- #
+# Passed to Gemini as response_schema so it returns validated JSON directly
+class LocationsOut(BaseModel):
+    locations: list[str]
+    error: str
+
+
+class Suggestion(BaseModel):
+    restaurant_name: str
+    note: str
+    conclusion: str
+
+
+class SuggestionsOut(BaseModel):
+    greeting: str
+    suggestions: list[Suggestion]
+
+
+class SummaryOut(BaseModel):
+    restaurant_name: str
+    must_try_dishes: list[str]
+    highlights: str
+    notes: str
+    conclusion: str
+    rating: float
+
+
+class AnswerOut(BaseModel):
+    restaurant_name: str
+    answer: str
+
+
+def _json_config(schema):
+    """Generation config that makes Gemini return JSON matching the given schema."""
+    return genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+
+
+class MicroBatcher:
+    """
+    Collect items submitted by concurrent callers and process them in batches.
+
+    Args:
+        process_batch (callable): Function mapping a list of items to a list of results, in order.
+        max_batch_size (int): Largest number of items handed to process_batch at once.
+        max_wait (float): Seconds to wait for more items once the first one has arrived.
+    """
+
+    def __init__(self, process_batch, max_batch_size, max_wait=BATCH_WAIT):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, item):
+        """Queue an item and block until its batch has been processed."""
+        future = Future()
+        self._queue.put((item, future))
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        return future.result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.process_batch([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+@lru_cache(maxsize=1)
+def _get_embed_model():
+    # Load the weights and tokenizer once per process, not on every request.
+    # Prefer the INT8-quantized ONNX export when it exists; MiniLM uses mean pooling.
+    if os.path.isdir(ONNX_MODEL_DIR):
+        return OptimumEmbedding(folder_name=ONNX_MODEL_DIR, pooling="mean", embed_batch_size=EMBED_BATCH_SIZE)
+    return HuggingFaceEmbedding(model_name=EMBED_MODEL, embed_batch_size=EMBED_BATCH_SIZE)
+
+
+def normalize_vector(vector):
+    """
+    L2-normalize a vector so that its dot product with another unit vector equals their cosine similarity.
+
+    Args:
+        vector (list): Embedding values.
+
+    Returns:
+        list: Unit-length vector as float32 values.
+    """
+    vector = np.asarray(vector, dtype=np.float32)
+    vector /= np.linalg.norm(vector) + 1e-12
+    return vector.tolist()
+
+
+def _embed_batch(texts):
+    # MiniLM has no query instruction, so text embeddings equal query embeddings
+    return _get_embed_model().get_text_embedding_batch(texts)
+
+
+EMBED_BATCHER = MicroBatcher(_embed_batch, max_batch_size=EMBED_BATCH_SIZE)
+
+
+@lru_cache(maxsize=1024)
+def _cached_embedding(text):
+    # Exceptions are not cached, so a failed call is retried next time
+    return normalize_vector(EMBED_BATCHER.submit(text))
+
+
+@lru_cache(maxsize=1)
+def _get_nlp():
+    # Only the NER component is used; tok2vec is kept in case ner listens to it
+    return spacy.load(NER_MODEL, disable=["tagger", "parser", "attribute_ruler", "lemmatizer"])
+
+
+def _extract_locations_batch(queries):
+    # nlp.pipe amortises the per-call pipeline overhead across queued queries
+    docs = _get_nlp().pipe(queries, batch_size=NER_BATCH_SIZE)
+    return [[ent.text for ent in doc.ents if ent.label_ in ["GPE", "LOC"]] for doc in docs]
+
+
+NER_BATCHER = MicroBatcher(_extract_locations_batch, max_batch_size=NER_BATCH_SIZE)
+
+
+@lru_cache(maxsize=1)
+def _get_gazetteer():
+    """
+    Build an Aho-Corasick automaton over the city names stored in Elasticsearch.
+
+    Locations look like "Philadelphia, PA, 935 Race St", so only the first comma-separated
+    part (the city) is added. Street, suite ("Ste 12", "#4", "Lot 3") and number-led parts are
+    left out, as are names of two characters or fewer. Names are matched case-sensitively,
+    since several cities are also ordinary words ("Media", "Eagle", "Oaks"); queries that
+    don't capitalise the city fall through to the Gemini fallback.
+
+    Returns:
+        ahocorasick.Automaton: Automaton mapping each city name to itself,
+        or None if the index holds no locations.
+    """
+    query = {
+        "size": 0,
+        "aggs": {
+            "location": {"terms": {"field": "metadata.location.keyword", "size": GAZETTEER_SIZE}}
+        },
+    }
+    result = ES.search(index=INDEX_NAME, body=query)
+
+    automaton = ahocorasick.Automaton()
+    for bucket in result["aggregations"]["location"]["buckets"]:
+        city = bucket["key"].split(",")[0].strip()
+        if len(city) <= 2 or city[0].isdigit():
+            continue
+        if city.lower().split()[0] in ["ste", "suite", "unit", "lot"] or city.startswith("#"):
+            continue
+        automaton.add_word(city, city)
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+
+def _match_gazetteer(automaton, query):
+    locations = []
+    for end, location in automaton.iter(query):
+        start = end - len(location) + 1
+        # Only accept whole-word matches, e.g. not "Media" inside "Multimedia"
+        if start > 0 and query[start - 1].isalnum():
+            continue
+        if end + 1 < len(query) and query[end + 1].isalnum():
+            continue
+        if location not in locations:
+            locations.append(location)
+    return locations
 
 
 def create_embedding(text):
-    # embed_model = HuggingFaceEmbedding(model_name=EMBED_MODEL)
     try:
-        embedding = EMBED_MODEL.get_query_embedding(text)
-        return embedding
+        return _cached_embedding(text.strip().lower())
     except Exception as e:
         print(f"Embedding error: {e}")
         return None
 
 
 def get_location(query):
-    # Initialize SpaCy model
+    # Only strip: NER relies on capitalisation, so the query is not lowercased.
+    # Each stage caches only successful lookups, so a transient failure is retried next time
+    query = query.strip()
+
+    # Match known cities from the index first
+    locations = []
     try:
-        nlp = spacy.load("en_core_web_sm")
-        doc = nlp(query)
-        locations = [ent.text for ent in doc.ents if ent.label_ in ["GPE", "LOC"]]
+        automaton = _get_gazetteer()
+        if automaton is not None:
+            locations = _match_gazetteer(automaton, query)
+    except (exceptions.ApiError, exceptions.TransportError) as e:
+        print(f"Elasticsearch error: {e}")
     except Exception as e:
-        print(f"SpaCy error: {e}")
-        locations = []
+        print(f"Location extraction error: {e}")
 
-    # If SpaCy found locations, return them
+    # Then SpaCy, for cities that aren't in the index or aren't capitalised
+    if not locations:
+        try:
+            locations = _cached_ner_locations(query)
+        except Exception as e:
+            print(f"SpaCy error: {e}")
+
+    # If a location was found, return it
     if locations:
         return ", ".join(locations)  # Use comma for clarity
 
     # Fallback to Gemini
     try:
-        model = genai.GenerativeModel(GEN_MODEL)
-        output_format = {
-            "locations": ["string"],
-            "error": "string"  # Optional error message if no locations found
-        }
-        prompt = f"""
-            You are an NER model tasked with extracting locations from the following query: "{query}".
-            A location can be a city, country, region, address, or any geographical entity.
-            Return a JSON object in this format: {output_format}.
-            - If locations are found, include them in the "locations" list.
-            - If no locations are found, set "locations" to an empty list and provide a brief explanation in "error".
-            - Do not include any other fields or explanations outside the JSON format.
-            """
-        response = model.generate_content(prompt)
-
-        # Handle Gemini response (assuming it returns a JSON-like string)
-        try:
-            result = json.loads(response.text)  # Adjust based on actual response structure
-            if result.get("locations"):
-                return ", ".join(result["locations"])
-            else:
-                # print(f"Gemini error: {result.get('error', 'No locations found')}")
-                return ""
-        except json.JSONDecodeError:
-            # print("Gemini response was not valid JSON")
-            return ""
+        return _cached_gemini_location(query)
     except google_exceptions.GoogleAPIError as e:
         print(f"Gemini API error: {e}")
-        return ""
+    except json.JSONDecodeError:
+        print("Gemini response was not valid JSON")
+    except ValueError as e:
+        # response.text raises ValueError when Gemini blocked the response
+        print(f"Gemini response error: {e}")
+    except Exception as e:
+        print(f"Location extraction error: {e}")
+    return ""
 
 
-def get_context(query):
-    if not query or not isinstance(query, str):
-        return []
+@lru_cache(maxsize=1024)
+def _cached_ner_locations(query):
+    return tuple(NER_BATCHER.submit(query))
+
 
-    # Extract location from query
-    location = get_location(query)
+@lru_cache(maxsize=1024)
+def _cached_gemini_location(query):
+    prompt = f"""
+        You are an NER model tasked with extracting locations from the following query: "{query}".
+        A location can be a city, country, region, address, or any geographical entity.
+        - If locations are found, include them in the "locations" list and set "error" to "".
+        - If no locations are found, set "locations" to an empty list and provide a brief explanation in "error".
+        """
+    response = GEMINI.generate_content(prompt, generation_config=_json_config(LocationsOut))
+    result = json.loads(response.text)
+    return ", ".join(result.get("locations") or [])
 
-    vector = create_embedding(query)
+
+def _knn_query(vector, location=None):
     search_query = {
         "knn": {
             "field": "review_vector",
             "query_vector": vector,
-            "k": 50,
-            "num_candidates": 100
+            "k": K,
+            "num_candidates": NUM_CANDIDATES
         },
+        # Keep only the best matching review per restaurant
+        "collapse": {"field": "metadata.restaurant_name.keyword"},
+        "size": MAX_RESTAURANTS,
         "_source": [
             "review",
             "metadata.restaurant_name",
             "metadata.location",
+            "metadata.address",
         ],  # Ensure nested fields are included
-        "track_total_hits": True
     }
 
-    # Add location filter if available
+    # Pre-filter the kNN search by location if available
     if location:
-        search_query["query"] = {
+        search_query["knn"]["filter"] = {
             "bool": {
                 "should": [
                     {"match": {"metadata.location": location}},
@@ -120,73 +351,86 @@ def get_context(query):
                 "minimum_should_match": 1
             }
         }
+    return search_query
 
-    result = ES.search(index=INDEX_NAME, body=search_query)
 
-    # Deduplicate restaurants and format documents
-    seen_restaurants = set()
-    documents = []
+def _tokens(text):
+    # Approximates the standard analyzer used by the match filter: lowercased word tokens
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _hits_in_location(result, location):
+    # True if every hit would pass the location match filter, so filtering changes nothing.
+    # Whole tokens are compared like the match query does, never substrings ("pa" is not in "Tampa")
+    location_tokens = _tokens(location)
     for doc in result["hits"]["hits"]:
-        restaurant_name = doc["_source"].get("metadata", {}).get("restaurant_name", "")
-        if restaurant_name not in seen_restaurants:
-            seen_restaurants.add(restaurant_name)
-            doc_content = {
-                "restaurant_name": restaurant_name,
-                "review": doc["_source"]["review"],
-                "location": doc["_source"].get("metadata", {}).get("location", ""),
-            }
-            documents.append(json.dumps(doc_content))  # Structured JSON string
-    return documents
+        metadata = doc["_source"].get("metadata", {})
+        hit_tokens = _tokens(metadata.get("location", "")) | _tokens(metadata.get("address", ""))
+        if not location_tokens & hit_tokens:
+            return False
+    return True
 
 
-def get_suggestions(query):
+def get_context(query):
     if not query or not isinstance(query, str):
-        return json.dumps([])
+        return []
 
-    # Get context documents
-    documents = get_context(query)
-    if not documents:
-        return json.dumps([])
+    # Location extraction may fall back to Gemini, so run it alongside the unfiltered kNN search
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        location_future = executor.submit(get_location, query)
+        vector = create_embedding(query)
+        result = ES.search(index=INDEX_NAME, body=_knn_query(vector))
+        location = location_future.result()
 
-    try:
-        model = genai.GenerativeModel(GEN_MODEL)
-
-        # Define output format
-        output_format = {
-            'greeting': 'string',
-            'suggestions': [
-                {
-                    'restaurant_name': 'string',
-                    'note': 'string',
-                    'conclusion': 'string'
-                }
-            ]
+    # Re-issue with the location pre-filter only if it would change the results
+    if location and not _hits_in_location(result, location):
+        result = ES.search(index=INDEX_NAME, body=_knn_query(vector, location))
+
+    documents = []
+    for doc in result["hits"]["hits"]:
+        doc_content = {
+            "restaurant_name": doc["_source"].get("metadata", {}).get("restaurant_name", ""),
+            "review": doc["_source"]["review"],
+            "location": doc["_source"].get("metadata", {}).get("location", ""),
         }
+        documents.append(doc_content)
+    return documents
+
 
-        prompt = f"""
+def _suggestions_prompt(query, documents, instructions):
+    return f"""
         You are a restaurant recommender. Suggest restaurants based on the user query : "{query}".
         Use the provided data to make recommendations.
         Only recommend restaurants with positive reviews (avoid negative sentiment).
         Do not recommend the same restaurant more than once.
-        Return a JSON object in this format: {json.dumps(output_format)}.
         - First start with a greeting message. A short, friendly welcome message (1-2 sentences) tailored to the user's query, expressing enthusiasm for finding the best matches.
         - Each suggestion must include: restaurant_name, note (why it matches the query), conclusion (recommendation summary).
-        - If no suitable restaurants are found, return:
-          {{
-            "suggestions": [],
-            "reason": say your reason here
-          }}
-        - Do not include any other fields or explanations outside the JSON format.
+        {instructions.strip()}
 
         Data:
-        {chr(10).join(documents)}
+        {orjson.dumps(documents).decode()}
+        """
+
+
+def get_suggestions(query):
+    if not query or not isinstance(query, str):
+        return json.dumps([])
+
+    # Get context documents
+    documents = get_context(query)
+    if not documents:
+        return json.dumps([])
+
+    try:
+        instructions = """
+        - If no suitable restaurants are found, set "suggestions" to an empty list and give your reason in "greeting".
         """
-        response = model.generate_content(prompt)
+        prompt = _suggestions_prompt(query, documents, instructions)
+        response = GEMINI.generate_content(prompt, generation_config=_json_config(SuggestionsOut))
 
         # Parse and validate response
         try:
-            result = response.text.split('```json')[1].split('```')[0]
-            result = json.loads(result)
+            result = json.loads(response.text)
             if not isinstance(result.get('suggestions'), list):
                 print("Invalid response format: 'suggestions' is not a list")
                 return json.dumps([])
@@ -199,16 +443,70 @@ def get_suggestions(query):
         return json.dumps([])
 
 
-def get_res_reviews(restaurant_name):
+def _parse_stream_line(line):
+    line = line.strip()
+    if not line or line.startswith("```"):
+        return None
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        print(f"Skipping invalid streamed line: {line}")
+        return None
+    if not isinstance(event, dict):
+        return None
+
+    # No response_schema on this path, so normalise events to the /suggest shape
+    if event.get("restaurant_name"):
+        return {field: str(event.get(field, "")) for field in Suggestion.model_fields}
+    if "greeting" in event:
+        return {"greeting": str(event["greeting"])}
+    return None
+
+
+def stream_suggestions(query):
     """
-    Retrieve reviews for a specific restaurant from Elasticsearch.
+    Stream restaurant suggestions as JSON Lines while Gemini is still generating them.
 
     Args:
-        restaurant_name (str): Name of the restaurant to query.
+        query (str): User's query.
 
-    Returns:
-        list: List of review documents (as dictionaries) with restaurant_name, review, location, and address.
+    Yields:
+        str: One JSON object per line; first {"greeting": ...}, then one object per suggestion
+        with restaurant_name, note and conclusion.
     """
+    if not query or not isinstance(query, str):
+        return
+
+    documents = get_context(query)
+    if not documents:
+        return
+
+    instructions = """
+        - Output JSON Lines: one JSON object per line, with no code fences and no other text.
+        - The first line is {"greeting": "..."}.
+        - Every following line is one suggestion: {"restaurant_name": "...", "note": "...", "conclusion": "..."}.
+        - If no suitable restaurants are found, output only the greeting line and give your reason in it.
+        """
+    try:
+        response = GEMINI.generate_content(_suggestions_prompt(query, documents, instructions), stream=True)
+
+        # Chunks don't align with lines, so only complete lines are parsed and forwarded
+        buffer = ""
+        for chunk in response:
+            buffer += chunk.text
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                event = _parse_stream_line(line)
+                if event:
+                    yield orjson.dumps(event).decode() + "\n"
+        event = _parse_stream_line(buffer)
+        if event:
+            yield orjson.dumps(event).decode() + "\n"
+    except (google_exceptions.GoogleAPIError, ValueError) as e:
+        print(f"Gemini API error: {e}")
+
+
+def _reviews_query(restaurant_name, question=None):
     query = {
         'size': 50,
         'query':{
@@ -222,26 +520,252 @@ def get_res_reviews(restaurant_name):
             "metadata.rating",
             "metadata.location",
         ],
+        "aggs": {
+            # The match query can hit similarly named restaurants, so average this restaurant only
+            "restaurant": {
+                "filter": {"term": {"metadata.restaurant_name.keyword": restaurant_name}},
+                "aggs": {"avg_rating": {"avg": {"field": "metadata.rating"}}},
+            }
+        },
     }
-    result = ES.search(index=INDEX_NAME, body=query)
+
+    # Summaries are built offline and need the full text (dishes are often mentioned late in a
+    # review), so reviews are only cut down for Q&A, to the passages relevant to the question
+    if question:
+        query["_source"].remove("review")
+        query["highlight"] = {
+            "highlight_query": {"match": {"review": question}},
+            "fields": {
+                "review": {
+                    "fragment_size": REVIEW_FRAGMENT_SIZE,
+                    "number_of_fragments": REVIEW_FRAGMENTS,
+                    "no_match_size": REVIEW_FRAGMENT_SIZE,  # reviews without a match return their opening instead
+                }
+            },
+        }
+    return query
+
+
+def _parse_reviews(restaurant_name, result):
+    hits = result["hits"]["hits"]
+    if not hits:
+        return {}
+
     reviews = []
-    result = result["hits"]["hits"]
-    for doc in result:
-        reviews.append(doc['_source']['review'])
+    for doc in hits:
+        if "highlight" in doc:
+            reviews.append(" ... ".join(doc["highlight"].get("review", [])))
+        elif "review" in doc["_source"]:
+            reviews.append(doc["_source"]["review"])
+
+    rating = result["aggregations"]["restaurant"]["avg_rating"]["value"]
+    if rating is None:
+        # The requested name didn't match exactly (e.g. casing or apostrophes from Gemini),
+        # so average the matched reviews of the top hit's restaurant instead
+        top_name = hits[0]["_source"].get("metadata", {}).get("restaurant_name")
+        ratings = [
+            doc["_source"]["metadata"]["rating"] for doc in hits
+            if doc["_source"].get("metadata", {}).get("restaurant_name") == top_name
+            and doc["_source"]["metadata"].get("rating") is not None
+        ]
+        rating = sum(ratings) / len(ratings) if ratings else None
 
     documents = {
         "restaurant_name": restaurant_name,
-        "reviews": "\n".join(reviews),
-        "rating": result[0]["_source"].get("metadata", {}).get("rating", 0),
-        "location": result[0]["_source"].get("metadata", {}).get("location", "")
+        "reviews": reviews,
+        "rating": round(rating, 1) if rating is not None else None,
+        "location": hits[0]["_source"].get("metadata", {}).get("location", "")
     }
     return documents
 
 
+def get_res_reviews(restaurant_name, question=None):
+    """
+    Retrieve reviews for a specific restaurant from Elasticsearch.
+
+    Args:
+        restaurant_name (str): Name of the restaurant to query.
+        question (str, optional): User's question; if given, only review fragments relevant to it are returned.
+
+    Returns:
+        dict: Restaurant name, list of reviews (fragments if a question was given), average rating
+        (None if unknown) and location, or an empty dict if no reviews were found.
+    """
+    result = ES.search(index=INDEX_NAME, body=_reviews_query(restaurant_name, question))
+    return _parse_reviews(restaurant_name, result)
+
+
+def get_res_reviews_batch(restaurant_names):
+    """
+    Retrieve reviews for several restaurants in a single Elasticsearch msearch round trip.
+
+    Args:
+        restaurant_names (list): Names of the restaurants to query.
+
+    Returns:
+        list: One reviews dict per restaurant, in the same order, as returned by get_res_reviews.
+    """
+    if not restaurant_names:
+        return []
+
+    searches = []
+    for restaurant_name in restaurant_names:
+        searches.append({"index": INDEX_NAME})
+        searches.append(_reviews_query(restaurant_name))
+    result = ES.msearch(searches=searches)
+
+    documents = []
+    for restaurant_name, response in zip(restaurant_names, result["responses"]):
+        if "error" in response:
+            print(f"Elasticsearch error: {response['error']}")
+            documents.append({})
+        else:
+            documents.append(_parse_reviews(restaurant_name, response))
+    return documents
+
+
+SUMMARY_MAPPING = {
+    "properties": {
+        "restaurant_name": {"type": "keyword"},
+        "summary": {"type": "object", "enabled": False},  # returned as-is, never searched
+        "location": {"type": "text"},
+        "rating": {"type": "float"},
+        "review_count_at_gen": {"type": "integer"},
+    }
+}
+
+
+@lru_cache(maxsize=1)
+def _ensure_summary_index():
+    if ES.indices.exists(index=SUMMARY_INDEX):
+        return
+    try:
+        ES.indices.create(index=SUMMARY_INDEX, mappings=SUMMARY_MAPPING)
+    except exceptions.BadRequestError as e:
+        # Another worker created it in the meantime
+        if e.error != "resource_already_exists_exception":
+            raise
+
+
+def get_review_counts(restaurant_names):
+    """
+    Count the reviews indexed for each restaurant.
+
+    Args:
+        restaurant_names (list): Names of the restaurants to count.
+
+    Returns:
+        dict: Restaurant name to number of reviews, for restaurants that have any.
+    """
+    query = {
+        "size": 0,
+        "query": {"terms": {"metadata.restaurant_name.keyword": restaurant_names}},
+        "aggs": {
+            "restaurants": {
+                "terms": {"field": "metadata.restaurant_name.keyword", "size": max(len(restaurant_names), 1)}
+            }
+        },
+    }
+    result = ES.search(index=INDEX_NAME, body=query)
+    return {bucket["key"]: bucket["doc_count"] for bucket in result["aggregations"]["restaurants"]["buckets"]}
+
+
+def get_stored_summaries(restaurant_names):
+    """
+    Look up precomputed summaries in the summary index.
+
+    Args:
+        restaurant_names (list): Names of the restaurants to look up.
+
+    Returns:
+        dict: Restaurant name to its stored document (summary, location, rating, review_count_at_gen),
+        only for restaurants that have one.
+    """
+    if not restaurant_names:
+        return {}
+
+    try:
+        result = ES.mget(index=SUMMARY_INDEX, ids=restaurant_names)
+    except exceptions.NotFoundError:
+        return {}
+    return {doc["_id"]: doc["_source"] for doc in result["docs"] if doc.get("found")}
+
+
+def _store_summary(restaurant_name, summary, review_count):
+    result = json.loads(summary)
+    # Failed generations and "no reviews" answers are not stored, so they are retried next time
+    if not isinstance(result, dict) or "conclusion" not in result:
+        return False
+
+    _ensure_summary_index()
+    ES.index(index=SUMMARY_INDEX, id=restaurant_name, document={
+        "restaurant_name": restaurant_name,
+        "summary": result,
+        "location": result.get("location", ""),
+        "rating": result.get("rating", 0),
+        "review_count_at_gen": review_count,
+    })
+    return True
+
+
+def refresh_summaries(restaurant_names):
+    """
+    Generate summaries with Gemini and store them in the summary index.
+
+    Reviews for all restaurants are fetched with one msearch and the Gemini calls run in parallel.
+
+    Args:
+        restaurant_names (list): Names of the restaurants to summarize.
+
+    Returns:
+        tuple: Dict of restaurant name to its summary as a JSON string, and the list of
+        restaurant names whose summary was actually stored.
+    """
+    documents = get_res_reviews_batch(restaurant_names)
+    review_counts = get_review_counts(restaurant_names)
+    with ThreadPoolExecutor(max_workers=GEMINI_WORKERS) as executor:
+        summaries = list(executor.map(_summarize, restaurant_names, documents))
+
+    stored = []
+    for restaurant_name, summary in zip(restaurant_names, summaries):
+        try:
+            if _store_summary(restaurant_name, summary, review_counts.get(restaurant_name, 0)):
+                stored.append(restaurant_name)
+        except exceptions.ApiError as e:
+            print(f"Elasticsearch error: {e}")
+    return dict(zip(restaurant_names, summaries)), stored
+
+
 def get_summary(restaurant_name):
-    model = genai.GenerativeModel(GEN_MODEL)
-    documents = get_res_reviews(restaurant_name)
+    stored = get_stored_summaries([restaurant_name])
+    if restaurant_name in stored:
+        return json.dumps(stored[restaurant_name]["summary"])
+    summaries, _ = refresh_summaries([restaurant_name])
+    return summaries[restaurant_name]
+
 
+def get_summaries(restaurant_names):
+    """
+    Summarize several restaurants, using precomputed summaries where available.
+
+    Args:
+        restaurant_names (list): Names of the restaurants to summarize.
+
+    Returns:
+        str: JSON string mapping each restaurant name to its summary.
+    """
+    stored = get_stored_summaries(restaurant_names)
+    summaries = {name: doc["summary"] for name, doc in stored.items()}
+
+    missing = [name for name in restaurant_names if name not in stored]
+    if missing:
+        refreshed, _ = refresh_summaries(missing)
+        for name, summary in refreshed.items():
+            summaries[name] = json.loads(summary)
+    return json.dumps({name: summaries[name] for name in restaurant_names})
+
+
+def _summarize(restaurant_name, documents):
     if not documents:
         return json.dumps({
             "restaurant_name": restaurant_name,
@@ -249,35 +773,25 @@ def get_summary(restaurant_name):
         })
 
     try:
-
-        output_format = {
-            'restaurant_name': 'string',
-            'must_try_dishes': 'list',
-            'highlights': 'string',
-            'notes': 'string',
-            'conclusion': 'string',
-            'rating': 'number'
-        }
-
         prompt = f'''You are a restaurant recommender. 
         Your task is to analyze reviews for the restaurant '{restaurant_name}' and provide a structured summary based on the given reviews
         **Input Reviews**:
-        {''.join(json.dumps(documents))}
-        Return a JSON object in this format: {json.dumps(output_format)}.
+        {orjson.dumps(documents).decode()}
         **Instructions**:
         1. Analyze the reviews to identify:
         - **Must try dishes:**: List specific dishes recommended based on the reviews, up to 5 dishes, if available. If no dishes are mentioned, state ""
         - **Highlights**: Provide a short and concise summary of positive aspects or strengths of the restaurant (e.g., ambiance, service, food quality), if available. If none, state ""
         - **notes**: Note any negative aspects or areas for improvement shortly and concisely(e.g., slow service, pricing), if available. If none, state ""
         - **Conclusion**: Provide a concise summary of the restaurant's overall experience based on the reviews.
-        - **Rating**: For each restaurant, extract numerical ratings (e.g., 1 to 5 stars) from all provided reviews. Calculate the average rating, rounded to one decimal place. If no numerical ratings are available or if ratings are non-numerical, indicate 'No valid ratings found' for that restaurant.
+        - **Rating**: Use the average rating given in the input. If it is null, estimate the average star rating from the reviews, rounded to one decimal place, or 0 if none can be found.
         '''
 
-        response = model.generate_content(prompt)
+        response = GEMINI.generate_content(prompt, generation_config=_json_config(SummaryOut))
         try:
-            result = response.text.split('```json')[1].split('```')[0]
-            result = json.loads(result)
+            result = json.loads(response.text)
             result['location'] = documents['location']
+            if documents['rating'] is not None:
+                result['rating'] = documents['rating']  # exact average from Elasticsearch
             return json.dumps(result)
         except json.JSONDecodeError:
             print("Gemini response was not valid JSON")
@@ -299,36 +813,27 @@ def restaurant_qna(restaurant_name, query):
         str: JSON string with restaurant name and answer.
     """
     try:
-        model = genai.GenerativeModel(GEN_MODEL)
         # Get reviews
-        documents = get_res_reviews(restaurant_name)
+        documents = get_res_reviews(restaurant_name, query)
         if not documents:
             return json.dumps({
                 "restaurant_name": restaurant_name,
                 "answer": "No reviews found for the restaurant"
             })
-        # Define output format
-        output_format = {
-            "restaurant_name": "string",
-            "answer": "string"
-        }
         # Create prompt
         prompt = f"""                                                                                            
         You are a restaurant Q&A assistant. Answer the user's question about the restaurant '{restaurant_name}',
          based on user's query: '{query}'. 
         Use the provided reviews to formulate a precise and relevant answer. 
         **Input Reviews**:
-        {''.join(json.dumps(documents))}                                    
-        Return a JSON object in this format: {json.dumps(output_format)}.    
+        {orjson.dumps(documents).decode()}                                    
         **Instructions**:                                    
         - 'restaurant_name': The restaurant name ({restaurant_name}).                                                       
         - 'answer': The answer to the question, or an explanation if no relevant information is found.           
-        - Do not include additional fields or explanations outside the JSON format.                                                                                                      
         """
-        response = model.generate_content(prompt)
+        response = GEMINI.generate_content(prompt, generation_config=_json_config(AnswerOut))
         try:
-            result = response.text.split('```json')[1].split('```')[0]
-            result = json.loads(result)
+            result = json.loads(response.text)
             return json.dumps(result)
         except json.JSONDecodeError:
             print("Gemini response was not valid JSON")
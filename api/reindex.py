@@ -0,0 +1,79 @@
+"""
+One-time migration of the review index to a quantized, dot_product vector mapping.
+
+Copies every document from an existing index (e.g. the one built by LlamaIndex with cosine
+similarity) into a new destination index, L2-normalizing review_vector on the way. Elasticsearch
+then scores kNN candidates with a plain dot product instead of recomputing vector magnitudes, and
+walks an int8-quantized HNSW graph that is a quarter of the size of the float32 one.
+
+Cut-over:
+    - If ES_INDEX (INDEX_NAME) is an alias, it is moved to the destination index atomically
+      once the copy has finished, so the API switches over without a restart.
+    - If ES_INDEX is a concrete index (the default, "restaurant_reviews"), nothing is switched:
+      set ES_INDEX=<dest_index> in the fastapi service environment (docker-compose.yaml or .env)
+      and restart the API.
+
+Usage:
+    python reindex.py <source_index> <dest_index>
+"""
+import sys
+from elasticsearch import helpers
+from rag import ES, INDEX_NAME, normalize_vector
+
+
+INDEX_MAPPING = {
+    "properties": {
+        "review": {"type": "text"},
+        "review_vector": {
+            "type": "dense_vector",
+            "dims": 384,
+            "element_type": "float",
+            "index": True,
+            "similarity": "dot_product",  # requires unit-length vectors
+            # Scalar-quantize the HNSW graph to int8; raw float vectors are kept for rescoring
+            "index_options": {"type": "int8_hnsw", "m": 16, "ef_construction": 100},
+        },
+    }
+}
+
+
+def reindex(source_index, dest_index):
+    if source_index == dest_index:
+        raise ValueError("Source and destination index must be different")
+    if ES.indices.exists(index=dest_index):
+        raise ValueError(f"Destination index {dest_index} already exists")
+
+    ES.indices.create(index=dest_index, mappings=INDEX_MAPPING)
+
+    actions = (
+        {
+            "_index": dest_index,
+            "_id": doc["_id"],
+            "_source": {**doc["_source"], "review_vector": normalize_vector(doc["_source"]["review_vector"])},
+        }
+        for doc in helpers.scan(ES, index=source_index)
+    )
+    success, _ = helpers.bulk(ES, actions)
+    ES.indices.refresh(index=dest_index)
+    print(f"Reindexed {success} documents from {source_index} into {dest_index}")
+
+    switch_alias(dest_index)
+
+
+def switch_alias(dest_index, alias=INDEX_NAME):
+    if not ES.indices.exists_alias(name=alias):
+        print(f"{alias} is not an alias; set ES_INDEX={dest_index} for the API and restart it")
+        return
+
+    current = list(ES.indices.get_alias(name=alias))
+    actions = [{"remove": {"index": index, "alias": alias}} for index in current]
+    actions.append({"add": {"index": dest_index, "alias": alias}})
+    ES.indices.update_aliases(actions=actions)
+    print(f"Alias {alias} now points to {dest_index} (was {', '.join(current)})")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Usage: python reindex.py <source_index> <dest_index>")
+        sys.exit(1)
+    reindex(sys.argv[1], sys.argv[2])
@@ -1,34 +1,54 @@
 import streamlit as st
 import requests
+import json
+from requests.adapters import HTTPAdapter
 
 
 API_URL = 'http://fastapi:8000'
 
+
+@st.cache_resource
+def get_session():
+    # One pooled session per server process so calls to the API reuse keep-alive connections
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=20))
+    return session
+
+
+def stream_suggestions(query):
+    # Raises requests.RequestException on a non-200 status or if the stream breaks off
+    with get_session().get(f'{API_URL}/suggest/stream', params={'query': query}, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield json.loads(line)
+
 @st.cache_data
-def get_suggestions(query):
-    response = requests.get(f'{API_URL}/suggest?query={query}')
+def get_summary(res_name):
+    response = get_session().get(f'{API_URL}/summary/{res_name}')
     if response.status_code == 200:
         result = response.json()
         return result
     else:
-        st.error('Failed to get suggestions')
+        st.error('Failed to get summary')
         return None
 
+
 @st.cache_data
-def get_summary(res_name):
-    response = requests.get(f'{API_URL}/summary/{res_name}')
+def get_summaries(res_names):
+    response = get_session().post(f'{API_URL}/summaries', json={'restaurant_names': list(res_names)})
     if response.status_code == 200:
         result = response.json()
         return result
     else:
-        st.error('Failed to get summary')
+        st.error('Failed to get summaries')
         return None
 
 
 @st.cache_data
 def get_answers(res_name, user_query):
     payload = {'query': user_query + f' in {res_name}', 'restaurant_name': res_name}
-    response = requests.post(f'{API_URL}/query', json=payload)
+    response = get_session().post(f'{API_URL}/query', json=payload)
     if response.status_code == 200:
         result = response.json()
         return result
@@ -53,6 +73,9 @@ if 'suggestion' not in st.session_state:
 if 'active_window' not in st.session_state:
     st.session_state.active_window = None
 
+if 'summaries' not in st.session_state:
+    st.session_state['summaries'] = {}
+
 if 'selected_restaurant' not in st.session_state:
     st.session_state['selected_restaurant'] = None
 
@@ -64,6 +87,36 @@ st.title('Restaurant Recommender Chatbot')
 st.caption('AI chatbot restaurant recommender')
 
 
+def show_streamed_suggestions(query):
+    # Render the greeting and suggestions as they arrive, then hand them back in the /suggest format
+    result = {'greeting': '', 'suggestions': []}
+
+    def markdown_chunks():
+        for event in stream_suggestions(query):
+            if 'greeting' in event:
+                result['greeting'] = event['greeting']
+                yield event['greeting'] + '\n\n'
+            elif 'restaurant_name' in event:
+                suggestion = {key: event.get(key, '') for key in ['restaurant_name', 'note', 'conclusion']}
+                result['suggestions'].append(suggestion)
+                yield f"**{suggestion['restaurant_name']}**: {suggestion['note']}\n\n"
+
+    failed = False
+    placeholder = st.empty()
+    with placeholder.container():
+        st.subheader('Recommendations')
+        try:
+            st.write_stream(markdown_chunks())
+        except requests.RequestException:
+            failed = True
+    # The interactive list below replaces the streamed preview
+    placeholder.empty()
+    if failed:
+        # Shown after clearing the preview so the error stays visible; partial results are kept
+        st.error('Failed to get suggestions')
+    return result if result['greeting'] or result['suggestions'] else []
+
+
 def home():
     col1, col2 = st.columns([3, 1])
 
@@ -72,8 +125,7 @@ def home():
     if col2.button(':mag_right: Search'):
        if query:
            st.session_state['query'] = query
-           response = get_suggestions(query)
-           st.session_state['suggestion'] = response
+           st.session_state['suggestion'] = show_streamed_suggestions(query)
        else:
            st.warning('⚠️ Enter a valid query')
 
@@ -97,7 +149,7 @@ def home():
                 st.write(suggestion['note'])
 
             if st.session_state['selected_restaurant'] == suggestion['restaurant_name']:
-                summary = get_summary(suggestion['restaurant_name'])
+                summary = st.session_state['summaries'].get(suggestion['restaurant_name']) or get_summary(suggestion['restaurant_name'])
                 st.info(summary['conclusion'], icon='ℹ️')
                 tab1, tab2, tab3, tab4, tab5 = st.tabs(['Must try dishes', 'Highlights', 'Things to be noted', 'Location', 'Rating'])
                 with tab1:
@@ -112,6 +164,11 @@ def home():
                 with tab5:
                     st.write(summary['rating'])
 
+        # Prefetch every summary in one request so opening a restaurant doesn't wait on the API
+        res_names = tuple(suggestion['restaurant_name'] for suggestion in st.session_state['suggestion']['suggestions'])
+        if res_names:
+            st.session_state['summaries'] = get_summaries(res_names) or {}
+
 
 def chat_bot():
     if st.session_state['selected_restaurant']: